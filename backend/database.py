@@ -1,44 +1,122 @@
+import asyncio
 import os
 import datetime
-from typing import Any, Dict, List, Optional
-from pymongo import MongoClient
-from pymongo.collection import Collection
+from typing import Any, Dict, List, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
 
 # Database connection
 DATABASE_URL = os.getenv("DATABASE_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "appdb")
 
-_client = MongoClient(DATABASE_URL)
+_client = AsyncIOMotorClient(
+    DATABASE_URL,
+    maxPoolSize=200,
+    minPoolSize=10,
+    maxIdleTimeMS=300000,
+)
 db = _client[DATABASE_NAME]
 
 
-def _get_collection(name: str) -> Collection:
+def _get_collection(name: str) -> AsyncIOMotorCollection:
     return db[name]
 
 
-def create_document(collection_name: str, data: Dict[str, Any]) -> Dict[str, Any]:
-    now = datetime.datetime.utcnow()
-    payload = {**data, "created_at": now, "updated_at": now}
+def utcnow() -> datetime.datetime:
+    """Timezone-aware now; utcnow() is deprecated and naive."""
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+async def create_document(
+    collection_name: str, data: Dict[str, Any], now: Optional[datetime.datetime] = None
+) -> Dict[str, Any]:
+    # Callers pass freshly-built dicts (model_dump), so mutate in place
+    # rather than copying the whole document. Bulk callers can pass a
+    # shared `now` to avoid one clock read per document.
+    now = now or utcnow()
+    data["created_at"] = now
+    data["updated_at"] = now
     col = _get_collection(collection_name)
-    result = col.insert_one(payload)
-    payload["_id"] = str(result.inserted_id)
-    return payload
+    result = await col.insert_one(data)
+    data["_id"] = str(result.inserted_id)
+    return data
 
 
-def get_documents(
+async def get_documents(
     collection_name: str, filter_dict: Optional[Dict[str, Any]] = None, limit: int = 50
 ) -> List[Dict[str, Any]]:
     col = _get_collection(collection_name)
-    cursor = col.find(filter_dict or {}).limit(limit)
-    docs: List[Dict[str, Any]] = []
-    for doc in cursor:
+    # batch_size(limit) makes Mongo return everything in one getMore, and
+    # to_list drains the cursor in a single C-level fetch instead of a
+    # per-document Python loop.
+    cursor = col.find(filter_dict or {}).limit(limit).batch_size(limit)
+    docs = await cursor.to_list(limit)
+    for doc in docs:
         doc["_id"] = str(doc["_id"])  # serialize ObjectId
-        docs.append(doc)
     return docs
 
 
-def update_document(collection_name: str, filter_dict: Dict[str, Any], update: Dict[str, Any]) -> int:
+async def update_document(
+    collection_name: str,
+    filter_dict: Dict[str, Any],
+    update: Dict[str, Any],
+    now: Optional[datetime.datetime] = None,
+) -> int:
     col = _get_collection(collection_name)
-    update_payload = {"$set": {**update, "updated_at": datetime.datetime.utcnow()}}
-    res = col.update_one(filter_dict, update_payload, upsert=False)
+    update_payload = {"$set": {**update, "updated_at": now or utcnow()}}
+    res = await col.update_one(filter_dict, update_payload, upsert=False)
     return res.modified_count
+
+
+class BatchLoader:
+    """Coalesces concurrent point lookups into a single $in query.
+
+    Callers await load(key); lookups arriving within max_delay seconds are
+    flushed together as one find({key: {"$in": [...]}}), and each caller
+    gets its matching document (or None) back. Cuts N round-trips per
+    burst down to one and lets Mongo serve the whole batch from one index
+    scan.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        key: str = "_id",
+        projection: Optional[Dict[str, Any]] = None,
+        max_delay: float = 0.001,
+    ):
+        self._collection_name = collection_name
+        self._key = key
+        self._projection = projection
+        self._max_delay = max_delay
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._scheduled = False
+
+    async def load(self, key_value: Any) -> Optional[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((key_value, fut))
+        if not self._scheduled:
+            self._scheduled = True
+            loop.call_later(self._max_delay, lambda: asyncio.ensure_future(self._flush()))
+        return await fut
+
+    async def _flush(self) -> None:
+        batch, self._pending = self._pending, []
+        self._scheduled = False
+        if not batch:
+            return
+        keys = list({key for key, _ in batch})
+        try:
+            cursor = _get_collection(self._collection_name).find(
+                {self._key: {"$in": keys}}, projection=self._projection
+            )
+            docs = await cursor.to_list(None)
+        except Exception as exc:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+        by_key = {doc[self._key]: doc for doc in docs}
+        for key, fut in batch:
+            if not fut.done():
+                fut.set_result(by_key.get(key))
@@ -1,30 +1,129 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.encoders import ENCODERS_BY_TYPE
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, Any
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+import orjson
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+import hashlib
 import os
-import httpx
+from functools import lru_cache
+
+import numpy as np
 from bson import ObjectId
+from cachetools import TTLCache
+import httpx
+from pymongo import ReturnDocument
+
+from schemas import AnalyzeRequest, User, Portfolio, ChatMessage
+from database import BatchLoader, db, utcnow
+
+# Handler return values pass through jsonable_encoder before the response
+# class renders them; teach it about ObjectId so raw Mongo docs can be
+# returned without a per-field str(_id) rewrite.
+ENCODERS_BY_TYPE[ObjectId] = str
+
+
+class MongoJSONResponse(ORJSONResponse):
+    """orjson response with a str fallback for anything jsonable_encoder
+    doesn't see, e.g. BSON types in a directly-returned Response."""
 
-from schemas import User, Portfolio, ChatMessage
-from database import db, create_document, get_documents, update_document
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
 
-app = FastAPI(title="AI Robo Advisory")
+
+app = FastAPI(title="AI Robo Advisory", default_response_class=MongoJSONResponse)
+
+# Coalesces the per-request user lookups in /chat and /advice/analyze
+_user_loader = BatchLoader("user", projection={"name": 1, "risk_tolerance": 1, "goals": 1})
 
 # CORS
 FRONTEND_URL = os.getenv("FRONTEND_URL", "*")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*" if FRONTEND_URL == "*" else FRONTEND_URL],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+
+# With a wildcard origin every CORS answer is the same, so the headers can
+# be computed once instead of re-derived per request by CORSMiddleware.
+_CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-methods", b"*"),
+    (b"access-control-allow-headers", b"*"),
+    (b"access-control-max-age", b"600"),
+]
+
+
+class FastCORS:
+    """Minimal ASGI middleware for the wildcard-origin case.
+
+    Answers preflights immediately with a cached 204 and appends the
+    precomputed Access-Control-* headers to every other response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["method"] == "OPTIONS":
+            await send(
+                {"type": "http.response.start", "status": 204, "headers": _CORS_HEADERS}
+            )
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + _CORS_HEADERS
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+
+# Advice and chat replies are multi-KB text; compress anything over 512 B.
+app.add_middleware(GZipMiddleware, minimum_size=512, compresslevel=5)
+
+if FRONTEND_URL == "*":
+    app.add_middleware(FastCORS)
+else:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=[FRONTEND_URL],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+
+@app.on_event("startup")
+async def create_indexes():
+    # Hot routes filter on these fields; without indexes Mongo falls back
+    # to a full collection scan that grows with the user base.
+    await db["user"].create_index("email", unique=True)
+    await db["portfolio"].create_index("user_id", unique=True)
+    await db["portfolio_summary"].create_index("user_id", unique=True)
+
+
+@app.on_event("startup")
+async def open_http_client():
+    # One shared client keeps the TLS/HTTP2 connection to the HF API alive
+    # across requests instead of handshaking on every call.
+    app.state.http = httpx.AsyncClient(
+        timeout=60,
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=50, max_connections=200),
+    )
+
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await app.state.http.aclose()
 
 
 @app.get("/test")
 async def test():
     try:
-        db.list_collection_names()
+        await db.list_collection_names()
         return {"status": "ok"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -32,176 +131,414 @@ async def test():
 
 @app.post("/users/signin")
 async def signin(user: User):
-    existing = db["user"].find_one({"email": user.email})
-    if existing:
-        update_document(
-            "user",
-            {"_id": existing["_id"]},
-            {
-                "name": user.name,
-                "risk_tolerance": user.risk_tolerance,
-                "goals": user.goals,
-                "age": user.age,
-                "horizon_years": user.horizon_years,
-            },
-        )
-        refreshed = db["user"].find_one({"email": user.email})
-        refreshed["_id"] = str(refreshed["_id"])  # serialize
-        return {"user": refreshed}
-    created = create_document("user", user.model_dump())
-    return {"user": created}
+    now = utcnow()
+    doc = await db["user"].find_one_and_update(
+        {"email": user.email},
+        {
+            "$set": {**user.model_dump(), "updated_at": now},
+            "$setOnInsert": {"created_at": now},
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return {"user": doc}  # ObjectId stringified via ENCODERS_BY_TYPE
 
 
 @app.post("/portfolio/save")
 async def save_portfolio(p: Portfolio):
-    # Upsert by user_id for simplicity
-    existing = db["portfolio"].find_one({"user_id": p.user_id})
-    if existing:
-        db["portfolio"].update_one({"_id": existing["_id"]}, {"$set": p.model_dump()})
-        updated = db["portfolio"].find_one({"_id": existing["_id"]})
-        updated["_id"] = str(updated["_id"])  # serialize
-        return {"portfolio": updated}
-    created = create_document("portfolio", p.model_dump())
-    return {"portfolio": created}
+    # Atomic upsert by user_id: one round-trip instead of find + update + find
+    now = utcnow()
+    doc = await db["portfolio"].find_one_and_update(
+        {"user_id": p.user_id},
+        {
+            "$set": {**p.model_dump(), "updated_at": now},
+            "$setOnInsert": {"created_at": now},
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    # Holdings only change here, so materialize the summary once per save;
+    # analyze/chat then read it back with a single indexed find_one.
+    summary = _summarize_portfolio(doc)
+    await db["portfolio_summary"].replace_one(
+        {"user_id": p.user_id},
+        {"user_id": p.user_id, **summary, "updated_at": now},
+        upsert=True,
+    )
+    return {"portfolio": doc}  # ObjectId stringified via ENCODERS_BY_TYPE
 
 
-def _summarize_portfolio(portfolio: Dict[str, Any]) -> Dict[str, Any]:
-    holdings = portfolio.get("holdings", [])
-    total_cost = sum(h.get("avg_cost", 0) * h.get("quantity", 0) for h in holdings) or 1.0
-    by_sector: Dict[str, float] = {}
-    for h in holdings:
-        sector = h.get("sector") or "Other"
-        value = h.get("avg_cost", 0) * h.get("quantity", 0)
-        by_sector[sector] = by_sector.get(sector, 0.0) + value
-    sector_alloc = {k: round(v / total_cost * 100, 2) for k, v in by_sector.items()}
-    top_positions = sorted(
-        (
-            {
-                "symbol": h.get("symbol"),
-                "weight": round((h.get("avg_cost", 0) * h.get("quantity", 0)) / total_cost * 100, 2),
-            }
-            for h in holdings
-        ),
-        key=lambda x: x["weight"],
-        reverse=True,
-    )[:5]
+def _holdings_key(portfolio: Dict[str, Any]) -> Tuple[Tuple[Any, ...], ...]:
+    """Extract holdings as a hashable tuple so summaries can be memoized."""
+    return tuple(
+        (h.get("symbol"), h.get("quantity", 0), h.get("avg_cost", 0), h.get("sector"))
+        for h in portfolio.get("holdings", [])
+    )
+
+
+@lru_cache(maxsize=1024)
+def _summarize_holdings(holdings: Tuple[Tuple[Any, ...], ...]) -> Dict[str, Any]:
+    n = len(holdings)
+    if n == 0:
+        return {
+            "estimated_value": 1.0,
+            "sector_allocation": {},
+            "top_positions": [],
+            "holdings_count": 0,
+        }
+    # Structure-of-arrays layout: one C-level pass per aggregate instead of
+    # three Python loops over the holdings list.
+    qty = np.fromiter((h[1] for h in holdings), dtype=np.float64, count=n)
+    cost = np.fromiter((h[2] for h in holdings), dtype=np.float64, count=n)
+    value = qty * cost
+    total_cost = float(value.sum()) or 1.0
+
+    sectors = np.array([h[3] or "Other" for h in holdings])
+    uniq, inv = np.unique(sectors, return_inverse=True)
+    sector_value = np.bincount(inv, weights=value)
+    sector_alloc = {
+        str(s): round(float(v) / total_cost * 100, 2) for s, v in zip(uniq, sector_value)
+    }
+
+    k = min(5, n)
+    top_idx = np.argpartition(-value, k - 1)[:k]
+    top_idx = top_idx[np.argsort(-value[top_idx])]
+    top_positions = [
+        {
+            "symbol": holdings[i][0],
+            "weight": round(float(value[i]) / total_cost * 100, 2),
+        }
+        for i in top_idx
+    ]
     return {
         "estimated_value": round(total_cost, 2),
         "sector_allocation": sector_alloc,
         "top_positions": top_positions,
-        "holdings_count": len(holdings),
+        "holdings_count": n,
+    }
+
+
+def _summarize_portfolio(portfolio: Dict[str, Any]) -> Dict[str, Any]:
+    return _summarize_holdings(_holdings_key(portfolio))
+
+
+async def _summarize_portfolio_db(user_id: str) -> Optional[Dict[str, Any]]:
+    """Compute the portfolio summary inside Mongo.
+
+    A single $facet pipeline aggregates sector totals, top-5 positions and
+    the grand total server-side, so only a small result document crosses
+    the wire instead of the full holdings array. Returns None when the
+    pipeline produces nothing (no portfolio, or one with no holdings), in
+    which case callers fall back to the client-side summarizer.
+    """
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$unwind": "$holdings"},
+        {"$addFields": {"v": {"$multiply": ["$holdings.avg_cost", "$holdings.quantity"]}}},
+        {
+            "$facet": {
+                "by_sector": [
+                    {
+                        "$group": {
+                            "_id": {"$ifNull": ["$holdings.sector", "Other"]},
+                            "v": {"$sum": "$v"},
+                        }
+                    }
+                ],
+                "top": [
+                    {"$sort": {"v": -1}},
+                    {"$limit": 5},
+                    {"$project": {"_id": 0, "symbol": "$holdings.symbol", "v": 1}},
+                ],
+                "total": [{"$group": {"_id": None, "v": {"$sum": "$v"}, "n": {"$sum": 1}}}],
+            }
+        },
+    ]
+    try:
+        rows = await db["portfolio"].aggregate(pipeline).to_list(1)
+    except Exception:
+        return None
+    if not rows or not rows[0].get("total"):
+        return None
+    facets = rows[0]
+    total = facets["total"][0]["v"] or 1.0
+    return {
+        "estimated_value": round(total, 2),
+        "sector_allocation": {
+            r["_id"]: round(r["v"] / total * 100, 2) for r in facets["by_sector"]
+        },
+        "top_positions": [
+            {"symbol": r["symbol"], "weight": round(r["v"] / total * 100, 2)}
+            for r in facets["top"]
+        ],
+        "holdings_count": facets["total"][0]["n"],
     }
 
 
-def _heuristic_advice(user: Dict[str, Any], portfolio: Dict[str, Any]) -> str:
+async def _get_portfolio_summary(user_id: str) -> Optional[Dict[str, Any]]:
+    """Fetch the materialized summary, recomputing in Mongo if absent.
+
+    Portfolios saved before the portfolio_summary collection existed (or
+    written by other tooling) won't have a materialized row yet; the
+    aggregation pipeline covers those.
+    """
+    doc = await db["portfolio_summary"].find_one(
+        {"user_id": user_id},
+        projection={"_id": 0, "user_id": 0, "created_at": 0, "updated_at": 0},
+    )
+    if doc:
+        return doc
+    return await _summarize_portfolio_db(user_id)
+
+
+def _summary_key(summary: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Hashable fingerprint of a summary, for advice-cache invalidation."""
+    return (
+        summary["estimated_value"],
+        summary["holdings_count"],
+        tuple(sorted(summary["sector_allocation"].items())),
+        tuple((p["symbol"], p["weight"]) for p in summary["top_positions"]),
+    )
+
+
+# user_id -> (stamp, advice text); regenerated only when risk or holdings change
+_advice_cache: Dict[str, Tuple[Any, str]] = {}
+
+
+def _heuristic_advice(user: Dict[str, Any], summary: Dict[str, Any]) -> str:
+    risk = user.get("risk_tolerance", "balanced")
+    user_id = str(user.get("_id", ""))
+    stamp = (risk, _summary_key(summary))
+    cached = _advice_cache.get(user_id)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    text = _build_heuristic_advice(user, summary)
+    if user_id:
+        _advice_cache[user_id] = (stamp, text)
+    return text
+
+
+# Pre-built advice fragments; _build_heuristic_advice only selects and
+# interpolates them instead of assembling a line list per call.
+_ADVICE_RISK = {
+    "conservative": "- Favor high-quality bonds, broad-market ETFs, and larger cash buffer (6–12 months expenses).",
+    "balanced": "- A mix of equities and bonds (e.g., 60/40) with periodic rebalancing can fit your profile.",
+    "aggressive": "- Tilt toward equities/alternatives with disciplined DCA and volatility management.",
+}
+_DIVERSIFICATION_LOW = "- Consider adding exposure to more sectors to reduce concentration risk."
+_DIVERSIFICATION_OK = "- Sector mix looks reasonably diversified. Keep monitoring exposures."
+_CONCENTRATION_WARN = "\n- Your largest position is above 25% of portfolio. Gradual trimming may reduce idiosyncratic risk."
+_NEXT_STEPS = (
+    "Next steps:\n"
+    "- Set an automatic monthly investment and rebalance quarterly.\n"
+    "- Map each goal to a time horizon and choose suitable vehicles (401k/IRA/taxable)."
+)
+
+
+def _build_heuristic_advice(user: Dict[str, Any], summary: Dict[str, Any]) -> str:
     risk = user.get("risk_tolerance", "balanced")
-    summary = _summarize_portfolio(portfolio)
     value = summary["estimated_value"]
-    sectors = summary["sector_allocation"]
     top_positions = summary["top_positions"]
 
-    lines = [
-        f"Here’s a quick, personalized checkup on your portfolio (~${value:,.0f}).",
-        "Diversification:",
-    ]
-    if len(sectors) < 4:
-        lines.append("- Consider adding exposure to more sectors to reduce concentration risk.")
-    else:
-        lines.append("- Sector mix looks reasonably diversified. Keep monitoring exposures.")
+    div = _DIVERSIFICATION_LOW if len(summary["sector_allocation"]) < 4 else _DIVERSIFICATION_OK
+    conc = _CONCENTRATION_WARN if top_positions and top_positions[0]["weight"] > 25 else ""
+    return (
+        f"Here’s a quick, personalized checkup on your portfolio (~${value:,.0f}).\n"
+        f"Diversification:\n{div}{conc}\n"
+        f"Risk alignment:\n{_ADVICE_RISK.get(risk, _ADVICE_RISK['aggressive'])}\n"
+        f"{_NEXT_STEPS}"
+    )
 
-    if top_positions and top_positions[0]["weight"] > 25:
-        lines.append("- Your largest position is above 25% of portfolio. Gradual trimming may reduce idiosyncratic risk.")
 
-    lines.append("Risk alignment:")
-    if risk == "conservative":
-        lines.append("- Favor high-quality bonds, broad-market ETFs, and larger cash buffer (6–12 months expenses).")
-    elif risk == "balanced":
-        lines.append("- A mix of equities and bonds (e.g., 60/40) with periodic rebalancing can fit your profile.")
-    else:
-        lines.append("- Tilt toward equities/alternatives with disciplined DCA and volatility management.")
+# HF configuration is read once at import; _hf_complete sits on the
+# batching hot path and shouldn't re-resolve env vars per call.
+HF_TOKEN = os.getenv("HF_API_TOKEN")
+HF_MODEL = os.getenv("HF_CHAT_MODEL", "meta-llama/Llama-3.2-1B-Instruct")
+HF_URL = f"https://api-inference.huggingface.co/models/{HF_MODEL}"
+HF_HEADERS = {"Authorization": f"Bearer {HF_TOKEN}"} if HF_TOKEN else None
 
-    lines.append("Next steps:")
-    lines.append("- Set an automatic monthly investment and rebalance quarterly.")
-    lines.append("- Map each goal to a time horizon and choose suitable vehicles (401k/IRA/taxable).")
 
-    return "\n".join(lines)
+# Concurrent prompts are buffered briefly and sent to HF as one list-input
+# request, so the model amortizes its per-call overhead across the batch.
+class _HFBatcher:
+    """Buffers prompts for up to max_wait_s (or max_batch_size) and sends
+    them upstream as a single list-input request."""
 
+    def __init__(self, max_batch_size: int, max_wait_s: float):
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_s
+        self.queue: Optional["asyncio.Queue[Tuple[str, asyncio.Future]]"] = None
+        self.task: Optional[asyncio.Task] = None
 
-async def _hf_complete(prompt: str) -> str:
-    token = os.getenv("HF_API_TOKEN")
-    if not token:
-        return ""
-    model = os.getenv("HF_CHAT_MODEL", "meta-llama/Llama-3.2-1B-Instruct")
-    url = f"https://api-inference.huggingface.co/models/{model}"
-    headers = {"Authorization": f"Bearer {token}"}
-    payload = {"inputs": prompt, "parameters": {"max_new_tokens": 250, "temperature": 0.7}}
+    def start(self) -> None:
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._worker())
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+
+    async def submit(self, prompt: str) -> str:
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((prompt, fut))
+        return await fut
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait_s
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            texts = await _hf_infer_batch([prompt for prompt, _ in batch])
+            # A short or empty 200 response would otherwise leave the tail
+            # of the batch awaiting forever; pad with the empty-string
+            # failure convention so every future resolves.
+            if len(texts) < len(batch):
+                texts += [""] * (len(batch) - len(texts))
+            for (_, fut), text in zip(batch, texts):
+                if not fut.done():
+                    fut.set_result(text)
+
+
+# /chat needs interactive latency, so its prompts go out after at most
+# 20 ms. /advice/analyze tolerates seconds, so its prompts wait longer
+# and coalesce into larger, cheaper upstream batches.
+_hf_realtime = _HFBatcher(max_batch_size=16, max_wait_s=0.02)
+_hf_bulk = _HFBatcher(max_batch_size=32, max_wait_s=0.5)
+
+
+@app.on_event("startup")
+async def start_hf_batchers():
+    _hf_realtime.start()
+    _hf_bulk.start()
+
+
+@app.on_event("shutdown")
+async def stop_hf_batchers():
+    _hf_realtime.stop()
+    _hf_bulk.stop()
+
+
+async def _hf_infer_batch(prompts: List[str]) -> List[str]:
+    payload = {"inputs": prompts, "parameters": {"max_new_tokens": 250, "temperature": 0.7}}
     try:
-        async with httpx.AsyncClient(timeout=60) as client:
-            r = await client.post(url, headers=headers, json=payload)
-            r.raise_for_status()
-            data = r.json()
-            if isinstance(data, list) and data and "generated_text" in data[0]:
-                full = data[0]["generated_text"]
-                return full[len(prompt):].strip() if isinstance(full, str) and full.startswith(prompt) else full
-            if isinstance(data, dict) and "generated_text" in data:
-                return data["generated_text"]
-            return ""
+        r = await app.state.http.post(HF_URL, headers=HF_HEADERS, json=payload)
+        r.raise_for_status()
+        data = r.json()
     except Exception:
+        return [""] * len(prompts)
+
+    if not isinstance(data, list):
+        data = [data] * len(prompts)
+    texts = []
+    for prompt, item in zip(prompts, data):
+        if isinstance(item, list) and item:
+            item = item[0]
+        full = item.get("generated_text", "") if isinstance(item, dict) else ""
+        if isinstance(full, str) and full.startswith(prompt):
+            full = full[len(prompt):].strip()
+        texts.append(full if isinstance(full, str) else "")
+    return texts
+
+
+# Identical prompts within the TTL reuse the previous completion instead of
+# paying a multi-second inference round-trip; per-key locks collapse
+# concurrent identical prompts into a single upstream call.
+_hf_cache: TTLCache = TTLCache(maxsize=10_000, ttl=600)
+_hf_inflight: Dict[bytes, asyncio.Lock] = {}
+
+
+async def _hf_complete(prompt: str, batcher: Optional[_HFBatcher] = None) -> str:
+    if HF_HEADERS is None:
         return ""
+    if batcher is None:
+        batcher = _hf_realtime
+    key = hashlib.blake2b(prompt.encode(), digest_size=16).digest()
+    cached = _hf_cache.get(key)
+    if cached is not None:
+        return cached
+    lock = _hf_inflight.setdefault(key, asyncio.Lock())
+    async with lock:
+        cached = _hf_cache.get(key)
+        if cached is not None:
+            return cached
+        text = await batcher.submit(prompt)
+        if text:
+            _hf_cache[key] = text
+    _hf_inflight.pop(key, None)
+    return text
+
+
+# Prompt templates built once at import; the routes only format_map them
+# instead of re-assembling multi-line f-strings per request.
+_ANALYZE_TMPL = (
+    "You are a helpful, compliant financial robo-advisor. "
+    "Speak clearly and concisely. Avoid guaranteeing returns. \n\n"
+    "User risk tolerance: {risk}\n"
+    "Goals: {goals}\n"
+    "Portfolio summary: {summary}\n\n"
+    "Provide a brief recommendation in 5-7 bullet points."
+)
+_CHAT_TMPL = (
+    "You are an AI robo-advisor. Use simple language, include disclaimers, "
+    "and tailor guidance to risk tolerance.\n\n"
+    "Risk: {risk}\n"
+    "Goals: {goals}\n"
+    "Portfolio: {summary}\n\n"
+    "User: {message}\nAssistant:"
+)
 
 
 @app.post("/advice/analyze")
-async def analyze(payload: Dict[str, Any]):
-    user_id = payload.get("user_id")
-    if not user_id:
-        raise HTTPException(status_code=400, detail="user_id is required")
-    try:
-        obj_id = ObjectId(user_id)
-    except Exception:
-        raise HTTPException(status_code=400, detail="invalid user_id")
-    user_doc = db["user"].find_one({"_id": obj_id})
+async def analyze(req: AnalyzeRequest):
+    user_id = str(req.user_id)
+    user_doc = await _user_loader.load(req.user_id)
     if not user_doc:
         raise HTTPException(status_code=404, detail="user not found")
 
-    portfolio_doc = db["portfolio"].find_one({"user_id": user_id})
-    if not portfolio_doc:
-        raise HTTPException(status_code=404, detail="portfolio not found")
-
-    summary = _summarize_portfolio(portfolio_doc)
-    heuristic = _heuristic_advice(user_doc, portfolio_doc)
+    summary = await _get_portfolio_summary(user_id)
+    if summary is None:
+        portfolio_doc = await db["portfolio"].find_one(
+            {"user_id": user_id}, projection={"holdings": 1}
+        )
+        if not portfolio_doc:
+            raise HTTPException(status_code=404, detail="portfolio not found")
+        summary = _summarize_portfolio(portfolio_doc)
+    heuristic = _heuristic_advice(user_doc, summary)
 
-    sys_prompt = (
-        "You are a helpful, compliant financial robo-advisor. "
-        "Speak clearly and concisely. Avoid guaranteeing returns. \n\n"
-        f"User risk tolerance: {user_doc.get('risk_tolerance')}\n"
-        f"Goals: {', '.join(user_doc.get('goals', []))}\n"
-        f"Portfolio summary: {summary}\n\n"
-        "Provide a brief recommendation in 5-7 bullet points."
+    sys_prompt = _ANALYZE_TMPL.format_map(
+        {
+            "risk": user_doc.get("risk_tolerance"),
+            "goals": ", ".join(user_doc.get("goals", [])),
+            "summary": summary,
+        }
     )
-    ai_text = await _hf_complete(sys_prompt)
+    ai_text = await _hf_complete(sys_prompt, batcher=_hf_bulk)
     advice_text = ai_text or heuristic
     return {"summary": summary, "advice": advice_text}
 
 
 @app.post("/chat")
 async def chat(msg: ChatMessage):
-    try:
-        obj_id = ObjectId(msg.user_id)
-    except Exception:
-        raise HTTPException(status_code=400, detail="invalid user_id")
-    user_doc = db["user"].find_one({"_id": obj_id})
-    portfolio_doc = db["portfolio"].find_one({"user_id": msg.user_id}) or {"holdings": []}
-    summary = _summarize_portfolio(portfolio_doc)
-
-    system = (
-        "You are an AI robo-advisor. Use simple language, include disclaimers, "
-        "and tailor guidance to risk tolerance."
-    )
-    prompt = (
-        f"{system}\n\nRisk: {user_doc.get('risk_tolerance')}\n"
-        f"Goals: {', '.join(user_doc.get('goals', []))}\n"
-        f"Portfolio: {summary}\n\n"
-        f"User: {msg.message}\nAssistant:"
+    user_doc = await _user_loader.load(msg.user_id)
+    summary = await _get_portfolio_summary(str(msg.user_id))
+    if summary is None:
+        summary = _summarize_portfolio({"holdings": []})
+
+    prompt = _CHAT_TMPL.format_map(
+        {
+            "risk": user_doc.get("risk_tolerance"),
+            "goals": ", ".join(user_doc.get("goals", [])),
+            "summary": summary,
+            "message": msg.message,
+        }
     )
     ai_text = await _hf_complete(prompt)
     if not ai_text:
@@ -1,5 +1,35 @@
-from typing import List, Optional
-from pydantic import BaseModel, EmailStr, Field
+from typing import Annotated, List, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+from pydantic import (
+    BaseModel,
+    BeforeValidator,
+    EmailStr,
+    Field,
+    InstanceOf,
+    PlainSerializer,
+    WithJsonSchema,
+)
+
+
+def _as_object_id(v):
+    if isinstance(v, ObjectId):
+        return v
+    try:
+        return ObjectId(v)
+    except (InvalidId, TypeError):
+        raise ValueError("invalid ObjectId")
+
+
+# Validates to a real ObjectId before the route handler runs, so handlers
+# never need a try/except around ObjectId(...) and bad IDs are rejected
+# with a 422 at the framework layer.
+ObjectIdField = Annotated[
+    InstanceOf[ObjectId],
+    BeforeValidator(_as_object_id),
+    PlainSerializer(lambda v: str(v), return_type=str),
+    WithJsonSchema({"type": "string"}),
+]
 
 
 class User(BaseModel):
@@ -24,6 +54,10 @@ class Portfolio(BaseModel):
 
 
 class ChatMessage(BaseModel):
-    user_id: str
+    user_id: ObjectIdField
     message: str = Field(..., min_length=1)
     history: Optional[List[dict]] = None
+
+
+class AnalyzeRequest(BaseModel):
+    user_id: ObjectIdField